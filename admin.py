@@ -1,8 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, g
 from auth import role_required
 from database import (
     get_all_books, get_book_by_id, add_book, update_book, delete_book,
-    get_borrowed_books_by_user
+    get_borrowed_books_by_user, get_book_stats
 )
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -10,20 +10,20 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 @admin_bp.before_request
 def check_admin():
     """Check if user is logged in and is an admin."""
-    if 'user_id' not in session:
+    if g.user_id is None:
         flash('Please login to access this page', 'warning')
         return redirect(url_for('auth.login'))
     
-    if session.get('role') != 'admin':
+    if g.role != 'admin':
         flash('You do not have permission to access this page', 'error')
         return redirect(url_for('auth.login'))
 
 @admin_bp.route('/dashboard')
 def dashboard():
     """Admin dashboard."""
-    books = get_all_books()
-    total_books = len(books)
-    available_books = sum(1 for book in books if book['available'])
+    stats = get_book_stats()
+    total_books = stats['total']
+    available_books = stats['available']
     issued_books = total_books - available_books
     
     context = {
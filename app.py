@@ -1,15 +1,47 @@
-from flask import Flask, render_template, redirect, url_for, flash, session
+from flask import Flask, render_template, redirect, url_for, flash, g
 from flask_jwt_extended import JWTManager
+from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
 from database import init_db, seed_data
 from auth import auth_bp
 from admin import admin_bp
 from member import member_bp
 import os
+from datetime import timedelta
+
+load_dotenv()
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-app.config['JWT_SECRET_KEY'] = 'your-jwt-secret-key-change-in-production'
-app.config['SESSION_TYPE'] = 'filesystem'
+
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+
+# The JWT is the only proof of identity and role, so never sign it with the
+# published fallback key unless development mode is enabled via FLASK_DEBUG
+jwt_secret_key = os.environ.get('JWT_SECRET_KEY')
+if not jwt_secret_key:
+    if not app.debug:
+        raise RuntimeError('JWT_SECRET_KEY must be set outside debug mode')
+    app.logger.warning('JWT_SECRET_KEY is not set; using an insecure development key')
+    jwt_secret_key = 'your-jwt-secret-key-change-in-production'
+app.config['JWT_SECRET_KEY'] = jwt_secret_key
+
+# Reuse compiled templates across restarts. Jinja's default cache directory
+# is private to the current user (mode 0700, ownership checked), so other
+# local users cannot plant bytecode in it. Flask already turns template
+# auto-reload off outside debug mode
+app.jinja_options = {
+    **app.jinja_options,
+    'bytecode_cache': FileSystemBytecodeCache(),
+    'cache_size': 1000,
+}
+
+# Authentication is carried only by the JWT in an HTTP-only cookie; the
+# Flask session is only used for flash messages. Forms carry no CSRF
+# token, so rely on SameSite=Lax to keep cross-site POSTs unauthenticated
+app.config['JWT_TOKEN_LOCATION'] = ['cookies']
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=8)
+app.config['JWT_COOKIE_SAMESITE'] = 'Lax'
+app.config['JWT_COOKIE_CSRF_PROTECT'] = False
 
 # Initialize JWT
 jwt = JWTManager(app)
@@ -19,20 +51,18 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(admin_bp)
 app.register_blueprint(member_bp)
 
-@app.before_request
-def startup():
-    """Initialize database on first run."""
-    if not os.path.exists('library.db'):
-        init_db()
-        seed_data()
+# Initialize database once at startup; both steps are no-ops when the
+# tables and admin user already exist
+init_db()
+seed_data()
 
 @app.route('/')
 def index():
     """Home page - redirect to appropriate dashboard."""
-    if 'user_id' not in session:
+    if g.user_id is None:
         return redirect(url_for('auth.login'))
     
-    if session.get('role') == 'admin':
+    if g.role == 'admin':
         return redirect(url_for('admin.dashboard'))
     else:
         return redirect(url_for('member.dashboard'))
@@ -1,10 +1,34 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, g
+from flask_jwt_extended import (
+    create_access_token, get_jwt_identity, get_jwt,
+    verify_jwt_in_request, set_access_cookies, unset_jwt_cookies
+)
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from functools import wraps
-from database import get_user_by_username, create_user, verify_password, get_user_by_id
+from database import get_user_auth, create_user, verify_password
 
 auth_bp = Blueprint('auth', __name__)
 
+@auth_bp.before_app_request
+def load_current_user():
+    """Resolve the logged-in user from the JWT cookie once per request."""
+    g.user_id = None
+    g.username = None
+    g.role = None
+    
+    try:
+        if not verify_jwt_in_request(optional=True):
+            return
+    except (JWTExtendedException, PyJWTError):
+        # Expired or tampered tokens are treated as logged out
+        return
+    
+    claims = get_jwt()
+    g.user_id = int(get_jwt_identity())
+    g.username = claims['username']
+    g.role = claims['role']
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Handle user login."""
@@ -16,29 +40,29 @@ def login():
             flash('Username and password are required', 'error')
             return redirect(url_for('auth.login'))
         
-        user = get_user_by_username(username)
+        user = get_user_auth(username)
         
         if user and verify_password(password, user['password']):
-            # Create JWT token
-            access_token = create_access_token(identity={
-                'user_id': user['id'],
-                'username': user['username'],
-                'role': user['role']
-            })
-            
-            # Store in session
-            session['access_token'] = access_token
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            session['role'] = user['role']
+            # Create JWT token carrying the user's identity and role
+            access_token = create_access_token(
+                identity=str(user['id']),
+                additional_claims={
+                    'username': username,
+                    'role': user['role']
+                }
+            )
             
             flash(f'Welcome {username}!', 'success')
             
             # Redirect based on role
             if user['role'] == 'admin':
-                return redirect(url_for('admin.dashboard'))
+                response = redirect(url_for('admin.dashboard'))
             else:
-                return redirect(url_for('member.dashboard'))
+                response = redirect(url_for('member.dashboard'))
+            
+            # Store token in an HTTP-only cookie
+            set_access_cookies(response, access_token)
+            return response
         else:
             flash('Invalid username or password', 'error')
     
@@ -80,13 +104,15 @@ def logout():
     """Handle user logout."""
     session.clear()
     flash('You have been logged out', 'success')
-    return redirect(url_for('auth.login'))
+    response = redirect(url_for('auth.login'))
+    unset_jwt_cookies(response)
+    return response
 
 def login_required(f):
     """Decorator to require login for a route."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if g.user_id is None:
             flash('Please login to access this page', 'warning')
             return redirect(url_for('auth.login'))
         return f(*args, **kwargs)
@@ -97,11 +123,11 @@ def role_required(required_role):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if 'user_id' not in session:
+            if g.user_id is None:
                 flash('Please login to access this page', 'warning')
                 return redirect(url_for('auth.login'))
             
-            if session.get('role') != required_role:
+            if g.role != required_role:
                 flash('You do not have permission to access this page', 'error')
                 return redirect(url_for('auth.login'))
             
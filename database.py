@@ -1,80 +1,160 @@
 import sqlite3
-import os
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 import bcrypt
+from cachetools import TTLCache
 
 DB_PATH = 'library.db'
 
-def get_db_connection():
-    """Get a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# bcrypt cost factor for new password hashes; checkpw reads the cost from
+# each stored hash, so existing hashes keep verifying after a change
+BCRYPT_ROUNDS = 10
 
-def init_db():
-    """Initialize the database with required tables."""
-    if os.path.exists(DB_PATH):
-        return
+# Precomputed bcrypt hash of the default admin password 'admin123'
+ADMIN_PASSWORD_HASH = b'$2b$10$iSQQBukuh5yiC4d0k3gzzuJhve2zhreK6kU9BWYJiEASOSqpKNqK2'
+
+# Number of idle connections kept open; matches the worker thread count
+POOL_SIZE = 8
+
+_pool = queue.Queue(maxsize=POOL_SIZE)
+
+class _QueryCache:
+    """Thread-safe TTL cache that drops results loaded across an invalidation."""
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    _MISSING = object()
     
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('admin', 'member'))
-        )
-    ''')
+    def __init__(self, maxsize, ttl):
+        self._data = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0
     
-    # Create books table
-    cursor.execute('''
-        CREATE TABLE books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            available INTEGER NOT NULL DEFAULT 1
-        )
-    ''')
+    def get_or_load(self, key, load):
+        """Return the cached value for key, running load() on a miss."""
+        with self._lock:
+            value = self._data.get(key, self._MISSING)
+            if value is not self._MISSING:
+                return value
+            generation = self._generation
+        
+        # Query outside the lock; if an invalidation happened meanwhile the
+        # result may be stale, so return it without caching it
+        value = load()
+        with self._lock:
+            if self._generation == generation:
+                self._data[key] = value
+        return value
     
-    # Create borrowed_books table
-    cursor.execute('''
-        CREATE TABLE borrowed_books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            book_id INTEGER NOT NULL,
-            borrowed_at TIMESTAMP NOT NULL,
-            returned_at TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (book_id) REFERENCES books(id)
-        )
+    def invalidate(self, key=None):
+        """Drop one key, or every key, and discard in-flight loads."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+# Short-lived login lookup cache shared across requests
+_user_auth_cache = _QueryCache(maxsize=1024, ttl=30)
+
+# Book catalog cache, cleared whenever the catalog changes
+_book_cache = _QueryCache(maxsize=2, ttl=60)
+
+def _connect():
+    """Open a new connection to the SQLite database."""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    
+    # WAL lets readers run alongside a writer and, with synchronous=NORMAL,
+    # avoids an fsync on every commit
+    conn.executescript('''
+        PRAGMA journal_mode = WAL;
+        PRAGMA synchronous = NORMAL;
+        PRAGMA temp_store = MEMORY;
+        PRAGMA mmap_size = 268435456;
+        PRAGMA cache_size = -65536;
     ''')
+    return conn
+
+@contextmanager
+def db_conn():
+    """Borrow a pooled connection to the SQLite database."""
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
     
-    conn.commit()
-    conn.close()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def _rows_to_dicts(cursor):
+    """Materialize the remaining rows of a cursor as plain dicts."""
+    cols = [d[0] for d in cursor.description]
+    return [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+def init_db():
+    """Initialize the database with required tables and indexes."""
+    with db_conn() as conn, conn:
+        # Create users table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL CHECK(role IN ('admin', 'member'))
+            )
+        ''')
+        
+        # Create books table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS books (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                author TEXT NOT NULL,
+                available INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+        
+        # Create borrowed_books table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS borrowed_books (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                book_id INTEGER NOT NULL,
+                borrowed_at TIMESTAMP NOT NULL,
+                returned_at TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id),
+                FOREIGN KEY (book_id) REFERENCES books(id)
+            )
+        ''')
+        
+        # Index active borrows per user and borrows per book; users.username
+        # is already covered by the index backing its UNIQUE constraint
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bb_user_active
+            ON borrowed_books (user_id, returned_at)
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bb_book
+            ON borrowed_books (book_id)
+        ''')
+        
+        # Partial index over available books only
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_books_available
+            ON books (available) WHERE available = 1
+        ''')
 
 def seed_data():
     """Seed initial data including default admin user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if admin already exists
-    cursor.execute('SELECT * FROM users WHERE username = ?', ('admin',))
-    if cursor.fetchone():
-        conn.close()
-        return
-    
-    # Hash admin password
-    admin_password = bcrypt.hashpw(b'admin123', bcrypt.gensalt())
-    
-    # Insert default admin
-    cursor.execute('''
-        INSERT INTO users (username, password, role)
-        VALUES (?, ?, ?)
-    ''', ('admin', admin_password, 'admin'))
-    
     # Insert some sample books (Indian fictional titles/authors)
     sample_books = [
         ('The Midnight Kite of Varanasi', 'Arunika Senapati'),
@@ -87,207 +167,213 @@ def seed_data():
         ('Echoes from the Spice Market', 'Mehul Joshi'),
     ]
     
-    for title, author in sample_books:
-        cursor.execute('''
-            INSERT INTO books (title, author, available)
+    with db_conn() as conn, conn:
+        # Insert default admin unless it exists; the UNIQUE username makes
+        # this safe when several worker processes seed at once
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO users (username, password, role)
             VALUES (?, ?, ?)
-        ''', (title, author, 1))
-    
-    conn.commit()
-    conn.close()
+        ''', ('admin', ADMIN_PASSWORD_HASH, 'admin'))
+        if cursor.rowcount != 1:
+            return
+        
+        # Only the process that created the admin adds the sample books
+        conn.executemany('''
+            INSERT INTO books (title, author, available)
+            VALUES (?, ?, 1)
+        ''', sample_books)
 
 def hash_password(password):
     """Hash a password using bcrypt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
 
 def verify_password(password, hashed):
     """Verify a password against its hash."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed)
 
-def get_user_by_username(username):
-    """Get user by username."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
-
-def get_user_by_id(user_id):
-    """Get user by ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+def get_user_auth(username):
+    """Get the ID, password hash and role needed to log a user in."""
+    def load():
+        with db_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, password, role FROM users WHERE username = ?', (username,))
+            user = cursor.fetchone()
+            return dict(user) if user else None
+    return _user_auth_cache.get_or_load(username, load)
 
 def create_user(username, password, role='member'):
     """Create a new user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     hashed_password = hash_password(password)
     
     try:
-        cursor.execute('''
-            INSERT INTO users (username, password, role)
-            VALUES (?, ?, ?)
-        ''', (username, hashed_password, role))
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
-        return user_id
+        with db_conn() as conn, conn:
+            cursor = conn.execute('''
+                INSERT INTO users (username, password, role)
+                VALUES (?, ?, ?)
+            ''', (username, hashed_password, role))
     except sqlite3.IntegrityError:
-        conn.close()
         return None
+    
+    # Drop any cached or in-flight miss for this username
+    _user_auth_cache.invalidate(username)
+    return cursor.lastrowid
 
 def get_all_books():
     """Get all books."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM books')
-    books = cursor.fetchall()
-    conn.close()
-    return books
+    def load():
+        with db_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, title, author, available FROM books')
+            return _rows_to_dicts(cursor)
+    return _book_cache.get_or_load('all', load)
 
 def get_available_books():
     """Get only available books."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM books WHERE available = 1')
-    books = cursor.fetchall()
-    conn.close()
-    return books
+    def load():
+        with db_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, title, author, available FROM books WHERE available = 1')
+            return _rows_to_dicts(cursor)
+    return _book_cache.get_or_load('available', load)
+
+def invalidate_book_cache():
+    """Drop cached book listings after the catalog changes."""
+    _book_cache.invalidate()
 
 def get_book_by_id(book_id):
     """Get book by ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM books WHERE id = ?', (book_id,))
-    book = cursor.fetchone()
-    conn.close()
-    return book
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, title, author, available FROM books WHERE id = ?', (book_id,))
+        return cursor.fetchone()
+
+def get_book_stats():
+    """Get total and available book counts."""
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*) AS total, COALESCE(SUM(available), 0) AS available
+            FROM books
+        ''')
+        return cursor.fetchone()
+
+def count_available_books():
+    """Count available books."""
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM books WHERE available = 1')
+        return cursor.fetchone()[0]
 
 def add_book(title, author):
     """Add a new book."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO books (title, author, available)
-        VALUES (?, ?, 1)
-    ''', (title, author))
-    conn.commit()
-    book_id = cursor.lastrowid
-    conn.close()
-    return book_id
+    with db_conn() as conn, conn:
+        cursor = conn.execute('''
+            INSERT INTO books (title, author, available)
+            VALUES (?, ?, 1)
+        ''', (title, author))
+    invalidate_book_cache()
+    return cursor.lastrowid
 
 def update_book(book_id, title, author):
     """Update book details."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE books
-        SET title = ?, author = ?
-        WHERE id = ?
-    ''', (title, author, book_id))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn, conn:
+        conn.execute('''
+            UPDATE books
+            SET title = ?, author = ?
+            WHERE id = ?
+        ''', (title, author, book_id))
+    invalidate_book_cache()
 
 def delete_book(book_id):
     """Delete a book."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Delete from borrowed_books first
-    cursor.execute('DELETE FROM borrowed_books WHERE book_id = ?', (book_id,))
-    
-    # Delete the book
-    cursor.execute('DELETE FROM books WHERE id = ?', (book_id,))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn, conn:
+        # Delete from borrowed_books first
+        conn.execute('DELETE FROM borrowed_books WHERE book_id = ?', (book_id,))
+        
+        # Delete the book
+        conn.execute('DELETE FROM books WHERE id = ?', (book_id,))
+    invalidate_book_cache()
 
 def borrow_book(user_id, book_id):
     """Record a book borrow transaction."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if book is available
-    cursor.execute('SELECT available FROM books WHERE id = ?', (book_id,))
-    result = cursor.fetchone()
-    if not result or not result['available']:
-        conn.close()
-        return False
-    
-    # Record the borrow
-    cursor.execute('''
-        INSERT INTO borrowed_books (user_id, book_id, borrowed_at)
-        VALUES (?, ?, ?)
-    ''', (user_id, book_id, datetime.now()))
-    
-    # Update book availability
-    cursor.execute('UPDATE books SET available = 0 WHERE id = ?', (book_id,))
-    
-    conn.commit()
-    conn.close()
+    with db_conn() as conn, conn:
+        # Claim the book only if it is still available
+        cursor = conn.execute('''
+            UPDATE books SET available = 0
+            WHERE id = ? AND available = 1
+            RETURNING id
+        ''', (book_id,))
+        if not cursor.fetchone():
+            return False
+        
+        # Record the borrow
+        conn.execute('''
+            INSERT INTO borrowed_books (user_id, book_id, borrowed_at)
+            VALUES (?, ?, ?)
+        ''', (user_id, book_id, datetime.now()))
+    invalidate_book_cache()
     return True
 
 def return_book(user_id, book_id):
     """Record a book return transaction."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Find the active borrow record
-    cursor.execute('''
-        SELECT id FROM borrowed_books
-        WHERE user_id = ? AND book_id = ? AND returned_at IS NULL
-    ''', (user_id, book_id))
-    borrow = cursor.fetchone()
-    
-    if not borrow:
-        conn.close()
-        return False
-    
-    # Update the borrow record
-    cursor.execute('''
-        UPDATE borrowed_books
-        SET returned_at = ?
-        WHERE id = ?
-    ''', (datetime.now(), borrow['id']))
-    
-    # Update book availability
-    cursor.execute('UPDATE books SET available = 1 WHERE id = ?', (book_id,))
-    
-    conn.commit()
-    conn.close()
+    with db_conn() as conn, conn:
+        # Close the active borrow record, if any
+        cursor = conn.execute('''
+            UPDATE borrowed_books
+            SET returned_at = ?
+            WHERE user_id = ? AND book_id = ? AND returned_at IS NULL
+            RETURNING id
+        ''', (datetime.now(), user_id, book_id))
+        if not cursor.fetchall():
+            return False
+        
+        # Update book availability
+        conn.execute('UPDATE books SET available = 1 WHERE id = ?', (book_id,))
+    invalidate_book_cache()
     return True
 
 def get_borrowed_books_by_user(user_id):
     """Get all borrowed books by a user (active and returned)."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT b.id, b.title, b.author, bb.borrowed_at, bb.returned_at
-        FROM borrowed_books bb
-        JOIN books b ON bb.book_id = b.id
-        WHERE bb.user_id = ?
-        ORDER BY bb.borrowed_at DESC
-    ''', (user_id,))
-    borrowed = cursor.fetchall()
-    conn.close()
-    return borrowed
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT b.id, b.title, b.author, bb.borrowed_at, bb.returned_at
+            FROM borrowed_books bb
+            JOIN books b ON bb.book_id = b.id
+            WHERE bb.user_id = ?
+            ORDER BY bb.borrowed_at DESC
+        ''', (user_id,))
+        return _rows_to_dicts(cursor)
 
 def get_active_borrowed_books_by_user(user_id):
     """Get active borrowed books by a user (not returned)."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT b.id, b.title, b.author, bb.borrowed_at
-        FROM borrowed_books bb
-        JOIN books b ON bb.book_id = b.id
-        WHERE bb.user_id = ? AND bb.returned_at IS NULL
-        ORDER BY bb.borrowed_at DESC
-    ''', (user_id,))
-    borrowed = cursor.fetchall()
-    conn.close()
-    return borrowed
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT b.id, b.title, b.author, bb.borrowed_at
+            FROM borrowed_books bb
+            JOIN books b ON bb.book_id = b.id
+            WHERE bb.user_id = ? AND bb.returned_at IS NULL
+            ORDER BY bb.borrowed_at DESC
+        ''', (user_id,))
+        return _rows_to_dicts(cursor)
+
+def count_active_borrowed_books_by_user(user_id):
+    """Count active borrowed books by a user (not returned)."""
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*) FROM borrowed_books
+            WHERE user_id = ? AND returned_at IS NULL
+        ''', (user_id,))
+        return cursor.fetchone()[0]
+
+def get_active_borrowed_book_ids(user_id):
+    """Get IDs of books a user currently has borrowed."""
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT book_id FROM borrowed_books
+            WHERE user_id = ? AND returned_at IS NULL
+        ''', (user_id,))
+        return {row[0] for row in cursor}
@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import (
+    Blueprint, render_template, stream_template, request, redirect, url_for,
+    flash, g, get_flashed_messages, Response
+)
 from auth import role_required, login_required
 from database import (
     get_available_books, borrow_book, return_book, get_book_by_id,
-    get_active_borrowed_books_by_user, get_borrowed_books_by_user,
-    delete_book, get_all_books
+    get_borrowed_books_by_user, delete_book, get_all_books,
+    count_available_books, count_active_borrowed_books_by_user,
+    get_active_borrowed_book_ids
 )
 
 member_bp = Blueprint('member', __name__, url_prefix='/member')
@@ -11,23 +15,23 @@ member_bp = Blueprint('member', __name__, url_prefix='/member')
 @member_bp.before_request
 def check_member():
     """Check if user is logged in and is a member."""
-    if 'user_id' not in session:
+    if g.user_id is None:
         flash('Please login to access this page', 'warning')
         return redirect(url_for('auth.login'))
     
-    if session.get('role') != 'member':
+    if g.role != 'member':
         flash('You do not have permission to access this page', 'error')
         return redirect(url_for('auth.login'))
 
 @member_bp.route('/dashboard')
 def dashboard():
     """Member dashboard."""
-    user_id = session.get('user_id')
-    borrowed_books = get_active_borrowed_books_by_user(user_id)
-    available_books_count = len(get_available_books())
+    user_id = g.user_id
+    borrowed_books_count = count_active_borrowed_books_by_user(user_id)
+    available_books_count = count_available_books()
     
     context = {
-        'borrowed_books_count': len(borrowed_books),
+        'borrowed_books_count': borrowed_books_count,
         'available_books_count': available_books_count
     }
     
@@ -37,16 +41,19 @@ def dashboard():
 def books():
     """View available books."""
     books = get_available_books()
-    user_id = session.get('user_id')
-    borrowed_books = get_active_borrowed_books_by_user(user_id)
-    borrowed_book_ids = [b['id'] for b in borrowed_books]
+    user_id = g.user_id
+    borrowed_book_ids = get_active_borrowed_book_ids(user_id)
+    
+    # Pop flashed messages before streaming starts: the session cookie is
+    # sent with the headers, so popping them mid-render would not persist
+    get_flashed_messages(with_categories=True)
     
-    return render_template('member/books.html', books=books, borrowed_book_ids=borrowed_book_ids)
+    return Response(stream_template('member/books.html', books=books, borrowed_book_ids=borrowed_book_ids))
 
 @member_bp.route('/borrow/<int:book_id>', methods=['POST'])
 def borrow(book_id):
     """Borrow a book."""
-    user_id = session.get('user_id')
+    user_id = g.user_id
     book = get_book_by_id(book_id)
     
     if not book:
@@ -67,7 +74,7 @@ def borrow(book_id):
 @member_bp.route('/return/<int:book_id>', methods=['POST'])
 def return_book_page(book_id):
     """Return a book."""
-    user_id = session.get('user_id')
+    user_id = g.user_id
     book = get_book_by_id(book_id)
     
     if not book: